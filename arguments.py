@@ -1,7 +1,7 @@
 from __future__ import annotations
 from collections import defaultdict
 
-from typing import TYPE_CHECKING, Callable, Set, Dict, List
+from typing import TYPE_CHECKING, Callable, DefaultDict, Set, Dict, List
 from props import *
 from unification import *
 from unification import alpha_renaming
@@ -262,7 +262,7 @@ argument_lookup: Dict[str, Callable[[List[Line]], Argument]] = {
 }
 
 def combine_variable_contexts(ctxs: tuple[Dict[str, Set[str]]]):
-    acc: Dict[str, Set[str]] = defaultdict(set)
+    acc: DefaultDict[str, Set[str]] = defaultdict(set)
     for ctx in ctxs:
         for val in ctx:
             acc[val].update(ctx[val])
@@ -278,8 +278,9 @@ class UninterpJust:
         variables = combine_variable_contexts(tuple(ctx.lines[arg].variables for arg in self.args))
         
         if self.name == 'ded':
-            assert tuple(sorted(self.args)) in ctx.proofs, f'{min(self.args)}-{max(self.args)} does not denote a complete proof!'
-            proof = ctx.proofs[tuple(sorted(self.args))]
+            lines = frozenset(self.args)
+            assert lines in ctx.proofs, f'{min(self.args)}-{max(self.args)} does not denote a complete proof!'
+            proof = ctx.proofs[lines]
             hyp, ded = ctx.proof_types[proof]
             assert len(hyp) == 1, f'A proof that uses multiple hypotheses cannot be used in the deduction rule! (hypotheses={hyp})'
             return Deduction(list(hyp)[0], ded), variables
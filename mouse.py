@@ -1,52 +1,65 @@
 from argparse import ArgumentParser
-from proof_parser import proof, form, ProofActionWithContext
+from proof_parser import proof, obligation_list
 from proof import Context
-from pyparsing import ParseException, delimited_list
+from pyparsing import ParseException, ParserElement
 from typing import List
 
-from props import Not, Or, Prop, PropHole
-from unification import unify
+from props import Imp, Or, Prop
+
+# memoize sub-parser results so alternatives in the recursive formula grammar aren't re-parsed
+ParserElement.enable_packrat(cache_size_limit=None)
 
 def preprocess(lines: List[str]) -> List[str]:
     processed_lines: List[str] = []
-    block = []
+    depth = 0
     for line in lines:
-        if line.startswith('| '):
-            block.append(line[2:])
-            continue
-        if len(block):
-            processed_lines += ['{'] + preprocess(block) + ['}']
-            block = []
-        processed_lines.append(line.strip())
-    
+        # each leading '| ' opens one more level of hypothetical world
+        line_depth = 0
+        while line.startswith('| ', 2 * line_depth):
+            line_depth += 1
+        if line_depth > depth:
+            processed_lines += ['{'] * (line_depth - depth)
+        elif line_depth < depth:
+            processed_lines += ['}'] * (depth - line_depth)
+        depth = line_depth
+        processed_lines.append(line[2 * line_depth:].strip())
+    processed_lines += ['}'] * depth
+
     return processed_lines
 
 def is_axiom(p: Prop):
-    a = PropHole('a')
-    return unify(p, Or(a, Not(a)), {}) or unify(p, Or(Not(a), a), {})
+    # the only axiom is the excluded middle, a \/ ~a (in either order)
+    if not isinstance(p, Or):
+        return False
+    l, r = p.p, p.q
+    if isinstance(r, Imp) and r.q is False and r.p == l:
+        return True
+    return isinstance(l, Imp) and l.q is False and l.p == r
 
 def main():    
     ctx = Context()
-    proof.add_parse_action(ProofActionWithContext(ctx))
 
     parser = ArgumentParser()
     parser.add_argument('input_file', type=str)
     args = parser.parse_args()
     try:
         lines = open(args.input_file).readlines()
-        obligations = delimited_list(form, ',').parse_string(lines[0], parse_all=True)
+        obligations = list(obligation_list.parse_string(lines[0], parse_all=True))
         # obligation = form.parse_string(lines[0], parse_all=True)[0]
         text = '\n'.join(preprocess(lines[1:]))
-        proof.parse_string(text, parse_all=True)
+        ctx.add_proof(proof.parse_string(text, parse_all=True)[0])
         if ctx.check():
             assert ctx.main_proof is not None
             hyp, deds = ctx.proof_types[ctx.main_proof]
             non_axiom_hyp = {h for h in hyp if not is_axiom(h)}
+            missing = [obligation for obligation in obligations if obligation not in deds]
             for obligation in obligations:
                 if obligation in deds:
                     print(f'{non_axiom_hyp} |- {obligation}')
-                else:
-                    raise Exception(f'Proof obligation {obligation} not met!')
+            if len(missing) == 1:
+                raise Exception(f'Proof obligation {missing[0]} not met!')
+            if missing:
+                raise Exception(f'Proof obligations {", ".join(map(repr, missing))} not met!')
         
     except ParseException as e:
         print(e.explain(depth=0))
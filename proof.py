@@ -1,6 +1,6 @@
 from __future__ import annotations
 from collections import defaultdict
-from typing import List, Dict, Set
+from typing import FrozenSet, List, Dict, Sequence, Set
 
 from props import *
 from arguments import Hypothesis, UninterpJust
@@ -8,6 +8,8 @@ from unification import *
 from unification import get_symbols
 
 class Line:
+    __slots__ = ('num', 'typ', 'just', 'variables', 'arg')
+    
     def __init__(self, num: int, typ: Prop, just: UninterpJust) -> None:
         self.num = num
         self.typ = typ
@@ -23,19 +25,18 @@ class Line:
     
 
 class Proof:
-    def __init__(self, lines: List[Line]):
+    __slots__ = ('lines', 'subproofs')
+    
+    def __init__(self, lines: List[Line], subproofs: Sequence[Proof] = ()):
         self.lines: Dict[int, Line] = {}
         for line in lines:
             self.lines[line.num] = line
+        self.subproofs = subproofs
             
     def compile(self, ctx: Context) -> tuple[Set[Prop], Set[Prop]]:
-        assumptions: Set[Prop] = set()
-        results: Set[Prop] = set()
-        
-        for line in self.lines.values():
-            if isinstance(line.arg, Hypothesis):
-                assumptions.add(line.typ)
-            results.add(line.typ)
+        lines = self.lines.values()
+        assumptions: Set[Prop] = {line.typ for line in lines if type(line.arg) is Hypothesis}
+        results: Set[Prop] = {line.typ for line in lines}
         ctx.register_type(self, (assumptions, results))
         return assumptions, results
     
@@ -49,15 +50,24 @@ class Context:
     def __init__(self) -> None:
         self.lines: Dict[int, Line] = {}
         self.proof_types: Dict[Proof, tuple[Set[Prop], Set[Prop]]] = {}
-        self.proofs: Dict[tuple[int, ...], Proof] = {}
+        self.proofs: Dict[FrozenSet[int], Proof] = {}
         self.main_proof: Proof | None = None
         self.dependences: Dict[int, Set[int]] = defaultdict(set)
         self.constants: Set[ModelRef] = set()
+        self.proofs_containing: Dict[int, List[Proof]] = defaultdict(list)
+        self.pending_lines: Dict[Proof, int] = {}
+        self.lines_checked = 0
     
     def add_proof(self, proof: Proof):
+        # subproofs are added first, so the outermost proof ends up as the main proof
+        for subproof in proof.subproofs:
+            self.add_proof(subproof)
         self.lines.update(proof.lines)
-        self.proofs[tuple(sorted(proof.lines.keys()))] = proof
+        self.proofs[frozenset(proof.lines)] = proof
         self.main_proof = proof
+        for num in proof.lines:
+            self.proofs_containing[num].append(proof)
+        self.pending_lines[proof] = len(proof.lines)
         
     def register_type(self, proof: Proof, typ: tuple[Set[Prop], Set[Prop]]):
         self.proof_types[proof] = typ
@@ -66,36 +76,64 @@ class Context:
         if self.main_proof is None:
             print('** No proofs added! **')
             return False
+        order = sorted(self.lines)
+        error = None
         try:
-            remaining_proofs = set(self.proofs.values())
-            lines_checked: Set[int] = set()
-            
-            # initialize constants from premises
-            for num in sorted(self.lines.keys()):
-                if self.lines[num].just.name == 'prem':
-                    sym, var = get_symbols(self.lines[num].typ)
-                    self.constants |= (sym - var)
-            
-            for num in sorted(self.lines.keys()):
-                print(f'{self.lines[num]}', end='\t')
+            error = self.verify_lines(order)
+        finally:
+            # report progress even if something other than a failed check escapes
+            # verify_lines, leaving the offending line just before its traceback
+            for num in order[:self.lines_checked]:
+                print(f'{self.lines[num]}\t\u2713')
+            if self.lines_checked < len(order):
+                print(f'{self.lines[order[self.lines_checked]]}', end='\t')
+        if error is not None:
+            print('\u2717')
+            print(f'Error: {error}')
+            return False
+        return True
+    
+    def verify_lines(self, order: List[int]) -> str | None:
+        # checks the lines in the given order without doing any I/O, returning the error
+        # raised by the first one that failed (if any). It still updates the context as it
+        # goes (constants, proof types, and how many lines passed in lines_checked, which
+        # is therefore still there if something other than a failed check escapes).
+        self.lines_checked = 0
+        
+        # number of lines left to check in each proof; a proof is compiled once this hits zero
+        pending = dict(self.pending_lines)
+        for proof in pending:
+            if pending[proof] == 0:
+                proof.compile(self)
+        
+        # initialize constants from premises
+        for num in order:
+            if self.lines[num].just.name == 'prem':
+                sym, var = get_symbols(self.lines[num].typ)
+                self.constants |= (sym - var)
+        
+        try:
+            for num in order:
                 self.lines[num].check(self)
                 sym, var = get_symbols(self.lines[num].typ)
                 self.constants |= (sym - var)
-                print('\u2713')
-                lines_checked.add(num)
+                self.lines_checked += 1
                 
-                for lines in self.proofs:
-                    if self.proofs[lines] in remaining_proofs and (set(lines).issubset(lines_checked)):
-                        self.proofs[lines].compile(self)
-                        remaining_proofs.remove(self.proofs[lines])
-                
-            return True
+                for proof in self.proofs_containing[num]:
+                    pending[proof] -= 1
+                    if pending[proof] == 0:
+                        proof.compile(self)
         except AssertionError as e:
-            print('\u2717')
-            print(f'Error: {e}')
-            return False
-            
+            return str(e)
+        return None
         
     def transitive_dependences(self, line_number: int):
-        deps = set(self.lines[line_number].just.args)
-        return deps | set().union(*(self.transitive_dependences(dep) for dep in deps))
\ No newline at end of file
+        # depth-first walk with a visited set, so shared dependences are only expanded once
+        deps: Set[int] = set()
+        stack = [line_number]
+        while stack:
+            for dep in self.lines[stack.pop()].just.args:
+                if dep not in deps:
+                    deps.add(dep)
+                    stack.append(dep)
+        return deps
\ No newline at end of file
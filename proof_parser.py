@@ -2,7 +2,7 @@ import pyparsing as pp
 
 from props import And, BaseProp, Exists, ForAll, Imp, Not, Or, ModelRef, Predicate
 from arguments import UninterpJust
-from proof import Line, Proof, Context
+from proof import Line, Proof
 
 r"""
 Grammar:
@@ -79,22 +79,16 @@ def LineAction(result):
     return Line(result[0], result[1], result[2])
 
 
-def ProofActionWithContext(ctx: Context):
-    def ProofAction(result):
-        external_proofs = []
-        main_proof = []
-        for line in result:
-            if isinstance(line[0], Proof):
-                external_proofs.append(line[0])
-            else:
-                main_proof.append(line[0])
-        
-        proof = Proof(main_proof)
-        ctx.add_proof(proof)
-        
-        return proof
-
-    return ProofAction
+def ProofAction(result):
+    subproofs = []
+    main_proof = []
+    for line in result:
+        if isinstance(line[0], Proof):
+            subproofs.append(line[0])
+        else:
+            main_proof.append(line[0])
+    
+    return Proof(main_proof, subproofs)
 
 proof = pp.Forward()
 num = pp.Word(pp.nums).set_parse_action(NumAction)
@@ -106,6 +100,8 @@ single_line = (line_start + form + just).set_parse_action(LineAction) + pp.Suppr
 embedded_proof = pp.Suppress('{') + proof + pp.Suppress('}')
 line = single_line | embedded_proof
 proof <<= pp.OneOrMore(pp.Group(line) | comment_line)
+proof.set_parse_action(ProofAction)
+obligation_list = pp.delimited_list(form, ',')
 
 if __name__ == '__main__':
     print(form.parse_string(r'P /\ Q'))
@@ -1,41 +1,94 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import inspect
+import weakref
+from dataclasses import dataclass, fields
+from functools import lru_cache
 from typing import Literal, Union
 
 
-@dataclass(eq=True, frozen=True)
-class BaseProp:
+_interned: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+class Interned:
+    # Nodes are hash-consed: building a node whose fields match a live node returns
+    # that node, so structurally equal props are always the same object. Children
+    # are already interned, so they're keyed by identity rather than by structure.
+    # Nodes also carry their structural hash and their symbols (see symbols_of),
+    # both computed once from their children's.
+    __slots__ = ('__weakref__', '_hash', 'symbols')
+    
+    def __new__(cls, *args, **kwargs):
+        if kwargs or len(args) != len(cls.__dataclass_fields__):
+            # bind (and reject bad arguments) like the generated dataclass __init__ would
+            args = tuple(_signature(cls).bind(*args, **kwargs).arguments.values())
+        key = (cls, *(id(arg) if isinstance(arg, Interned) else arg for arg in args))
+        node = _interned.get(key)
+        if node is None:
+            node = super().__new__(cls)
+            for field, arg in zip(fields(cls), args):
+                object.__setattr__(node, field.name, arg)
+            object.__setattr__(node, '_hash', hash((cls.__name__, *args)))
+            object.__setattr__(node, 'symbols', _collect_symbols(node))
+            _interned[key] = node
+        return node
+    
+    def __hash__(self) -> int:
+        return self._hash
+    
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self) or self._hash != other._hash:
+            return False
+        return all(getattr(self, field.name) == getattr(other, field.name) for field in fields(self))
+    
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, field.name) for field in fields(self))
+
+
+@lru_cache(maxsize=None)
+def _signature(cls: type) -> inspect.Signature:
+    return inspect.Signature([inspect.Parameter(field.name, inspect.Parameter.POSITIONAL_OR_KEYWORD) for field in fields(cls)])
+
+
+@dataclass(eq=False, frozen=True, init=False)
+class BaseProp(Interned):
+    __slots__ = ('name',)
     name: str
     
     def __repr__(self) -> str:
         return self.name
     
     
-@dataclass(eq=True, frozen=True)
-class PropHole:
+@dataclass(eq=False, frozen=True, init=False)
+class PropHole(Interned):
+    __slots__ = ('name',)
     name: str
     
     def __repr__(self) -> str:
         return f'?{self.name}'
     
-@dataclass(eq=True, frozen=True)
-class And:
+@dataclass(eq=False, frozen=True, init=False)
+class And(Interned):
+    __slots__ = ('p', 'q')
     p: Prop
     q: Prop
     
     def __repr__(self) -> str:
         return fr'({self.p} /\ {self.q})'
 
-@dataclass(eq=True, frozen=True)
-class Or:
+@dataclass(eq=False, frozen=True, init=False)
+class Or(Interned):
+    __slots__ = ('p', 'q')
     p: Prop
     q: Prop
     
     def __repr__(self) -> str:
         return fr'({self.p} \/ {self.q})'
        
-@dataclass(eq=True, frozen=True)
-class Imp:
+@dataclass(eq=False, frozen=True, init=False)
+class Imp(Interned):
+    __slots__ = ('p', 'q')
     p: Prop
     q: Prop
     
@@ -44,23 +97,26 @@ class Imp:
             return f'~{self.p}'
         return f'({self.p} -> {self.q})'
     
-@dataclass(eq=True, frozen=True)
-class ModelRef:
+@dataclass(eq=False, frozen=True, init=False)
+class ModelRef(Interned):
+    __slots__ = ('name',)
     name: str
     
     def __repr__(self):
         return self.name
     
     
-@dataclass(eq=True, frozen=True)
-class ModelRefHole:
+@dataclass(eq=False, frozen=True, init=False)
+class ModelRefHole(Interned):
+    __slots__ = ('name',)
     name: str
     
     def __repr__(self) -> str:
         return f'?{self.name}'
     
-@dataclass(eq=True, frozen=True)
-class Predicate:
+@dataclass(eq=False, frozen=True, init=False)
+class Predicate(Interned):
+    __slots__ = ('name', 'args')
     name: BaseProp
     args: tuple[ModelRef]
     
@@ -68,8 +124,9 @@ class Predicate:
         return f'{self.name}({", ".join(map(repr, self.args))})'
     
     
-@dataclass(eq=True, frozen=True)
-class ForAll:
+@dataclass(eq=False, frozen=True, init=False)
+class ForAll(Interned):
+    __slots__ = ('var', 'formula')
     var: Union[ModelRef, ModelRefHole]
     formula: Prop
     
@@ -77,8 +134,9 @@ class ForAll:
         return f'(forall {self.var}, {self.formula})'
     
     
-@dataclass(eq=True, frozen=True)
-class Exists:
+@dataclass(eq=False, frozen=True, init=False)
+class Exists(Interned):
+    __slots__ = ('var', 'formula')
     var: Union[ModelRef, ModelRefHole]
     formula: Prop
     
@@ -86,6 +144,38 @@ class Exists:
         return f'(exists {self.var}, {self.formula})'
     
     
+_NO_SYMBOLS: tuple[frozenset, frozenset] = (frozenset(), frozenset())
+
+
+# the model references used anywhere in p, and the subset of them bound by a quantifier
+def symbols_of(p: Prop) -> tuple[frozenset[ModelRef], frozenset[ModelRef]]:
+    if isinstance(p, Interned):
+        return p.symbols
+    return _NO_SYMBOLS
+
+
+def _union(a: frozenset, b: frozenset) -> frozenset:
+    # avoid copying when one side is empty, which is the common case near the leaves
+    if not b:
+        return a
+    if not a:
+        return b
+    return a | b
+
+
+def _collect_symbols(node: Interned) -> tuple[frozenset[ModelRef], frozenset[ModelRef]]:
+    if isinstance(node, (And, Or, Imp)):
+        lsym, lvar = symbols_of(node.p)
+        rsym, rvar = symbols_of(node.q)
+        return _union(lsym, rsym), _union(lvar, rvar)
+    elif isinstance(node, (ForAll, Exists)):
+        sym, var = symbols_of(node.formula)
+        return sym | {node.var}, var | {node.var}
+    elif isinstance(node, Predicate):
+        return frozenset(node.args), _NO_SYMBOLS[1]
+    return _NO_SYMBOLS
+
+
 def Not(p: Prop) -> Prop:
     return Imp(p, False)
 
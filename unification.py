@@ -1,7 +1,8 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Callable, Dict, Set
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
 
 from props import *
 
@@ -9,85 +10,31 @@ if TYPE_CHECKING:
     from proof import Line
 
 
-def unify(p: Prop, q: Prop, subst: Dict[str, Prop]={}, var_subst: Dict[str, ModelRef]={}) -> bool:
-    if PropHole in (type(p), type(q)):
-        if type(p) is PropHole:
-            hole, exp = p.name, q
-        else:
-            assert type(q) is PropHole # mypy
-            hole, exp = q.name, p
-            
-        if hole in subst:
-            return subst[hole] == exp
-        
-        subst[hole] = exp
-        return True
-    
-    if ModelRefHole in (type(p), type(q)):
-        if type(p) is ModelRefHole:
-            hole, exp = p.name, q
-        else:
-            assert type(q) is ModelRefHole
-            hole, exp = q.name, p
-    
-        if not (type(exp) is ModelRef):
-            return False
-        
-        if hole in var_subst:
-            return var_subst[hole] == exp
-    
-        var_subst[hole] = exp
-        return True
-        
-        
-    
-    # match p, q:
-    #     case (And(a, b), And(c, d)) | (Or(a, b), Or(c, d)) | (Imp(a, b), Imp(c, d)):
-    #         return unify(a, c, subst) and unify(b, d, subst)
-    #     case PropVar(a), PropVar(b):
-    #         assert False, 'Whoops! I need to implement this :)'
-    #     case (True, True) | (False, False):
-    #         return True
-    #     case BaseProp(a), BaseProp(b):
-    #         return a == b
-    #     case _:
-    #         return False
-    
-    
-    if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
-        return unify(p.p, q.p, subst, var_subst) and unify(p.q, q.q, subst, var_subst)
-    elif isinstance(p, PropHole) and isinstance(q, PropHole):
-        assert False, 'Whoops! I need to implement this :)'
-    elif isinstance(p, bool) and isinstance(q, bool):
-        return p == q
-    elif (isinstance(p, BaseProp) and isinstance(q, BaseProp)) or (isinstance(p, ModelRef) and isinstance(q, ModelRef)):
-        return p.name == q.name
-    elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
-        return unify(p.var, q.var, subst, var_subst) and unify(p.formula, q.formula, subst, var_subst)
-    elif isinstance(p, Predicate) and isinstance(q, Predicate):
-        return p.name == q.name and len(p.args) == len(q.args) and all(unify(xp, xq) for xp, xq, in zip(p.args, q.args))
-    else:
-        assert type(p) != type(q)
-        return False
-        
+_HOLE_TYPES = frozenset({PropHole, ModelRefHole})
+_BINARY_TYPES = frozenset({And, Or, Imp})
+_QUANT_TYPES = frozenset({ForAll, Exists})
+
+
 def diff_tree(p: Prop, q: Prop) -> tuple[Prop, Prop]:
-    if (isinstance(p, And) and isinstance(q, And)) or ((isinstance(p, Or) and isinstance(q, Or))) or ((isinstance(p, Imp) and isinstance(q, Imp))):
-        if p.p != q.p and p.q != q.q:
+    # descend iteratively for as long as exactly one child differs; props are
+    # interned, so each of these comparisons is an identity check
+    while True:
+        tp = type(p)
+        if tp is not type(q):
+            return p, q
+        if tp in _BINARY_TYPES:
+            if p.p is q.p:
+                assert p.q is not q.q, f'{p} == {q}'
+                p, q = p.q, q.q
+            elif p.q is q.q:
+                p, q = p.p, q.p
+            else:
+                return p, q
+        elif tp in _QUANT_TYPES and p.var is q.var:
+            p, q = p.formula, q.formula
+        else:
+            assert tp is not Predicate or p is not q, f'{p} == {q}'
             return p, q
-        if p.p == q.p:
-            return diff_tree(p.q, q.q)
-        if p.q == q.q:
-            return diff_tree(p.p, q.p)
-        assert False, f'{p} == {q}'
-    elif (isinstance(p, ForAll) and isinstance(q, ForAll)) or (isinstance(p, Exists) and isinstance(q, Exists)):
-        if p.var == q.var:
-            return diff_tree(p.formula, q.formula)
-        return p, q
-    elif isinstance(p, Predicate) and isinstance(q, Predicate):
-        assert p != q, f'{p} == {q}'
-        return p, q
-    else:
-        return p, q
     # match p, q:
     #     case (And(a, b), And(c, d)) | (Or(a, b), Or(c, d)) | (Imp(a, b), Imp(c, d)):
     #         if a != c and b != d:
@@ -106,64 +53,144 @@ def try_rewrite(transformation, rule):
     old_t, new_t = diff_tree(*transformation)
     old_r, new_r = rule
     
-    def rewrite():
-        subst = {}
-        var_subst = {}
-        assert unify(old_t, old_r, subst, var_subst) and unify(new_t, new_r, subst, var_subst), f'Failed to apply rule {old_r} <=> {new_r} to {transformation[0]} => {transformation[1]}!'
-        return subst, var_subst
+    # rules are equivalences, so try them left-to-right and then right-to-left,
+    # skipping any direction whose outer constructors can't match the diff
+    bindings = None
+    for matcher in _rule_index(rule).get((type(old_t), type(new_t)), ()):
+        bindings = matcher(old_t, new_t)
+        if bindings is not None:
+            break
+    assert bindings is not None, f'Failed to apply rule {old_r} <=> {new_r} to {transformation[0]} => {transformation[1]}!'
+    return bindings
+
+
+_NODE_TYPES = (BaseProp, ModelRef, Predicate, And, Or, Imp, ForAll, Exists, bool)
+
+
+def _outer_types(pattern: Prop) -> tuple[type, ...]:
+    # the types of node a pattern can match at its root
+    if type(pattern) is PropHole:
+        return _NODE_TYPES
+    if type(pattern) is ModelRefHole:
+        return (ModelRef,)
+    return (type(pattern),)
+
+
+RuleMatcher = Callable[[Prop, Prop], Optional[Tuple[Dict[str, Prop], Dict[str, ModelRef]]]]
+
+
+@lru_cache(maxsize=None)
+def _rule_index(rule: tuple[Prop, Prop]) -> Dict[tuple[type, type], List[RuleMatcher]]:
+    # matchers for both directions of the rule, bucketed by the (old, new) root types they can match
+    index: Dict[tuple[type, type], List[RuleMatcher]] = {}
+    lhs, rhs = rule
+    for old_r, new_r in ((lhs, rhs), (rhs, lhs)):
+        matcher = compile_rule(old_r, new_r)
+        for old_type in _outer_types(old_r):
+            for new_type in _outer_types(new_r):
+                index.setdefault((old_type, new_type), []).append(matcher)
+    return index
+
+
+def _has_holes(pattern: Prop) -> bool:
+    if type(pattern) in _HOLE_TYPES:
+        return True
+    if type(pattern) in _BINARY_TYPES:
+        return _has_holes(pattern.p) or _has_holes(pattern.q)
+    if type(pattern) in _QUANT_TYPES:
+        return _has_holes(pattern.var) or _has_holes(pattern.formula)
+    if type(pattern) is Predicate:
+        return any(map(_has_holes, pattern.args))
+    return False
+
+
+def compile_rule(old_r: Prop, new_r: Prop) -> RuleMatcher:
+    # Generates straight-line code matching `old` against old_r and `new` against new_r,
+    # returning the hole bindings as (props, model refs) dicts, or None. Holes live in locals
+    # until the end, and since props are interned every comparison is an identity check.
+    body: List[str] = []
+    namespace: Dict[str, object] = {t.__name__: t for t in _NODE_TYPES}
+    constants: List[Prop] = []
+    prop_holes: Dict[str, str] = {}
+    var_holes: Dict[str, str] = {}
+    
+    def match(pattern: Prop, expr: str):
+        tp = type(pattern)
+        if tp is PropHole or tp is ModelRefHole:
+            holes = prop_holes if tp is PropHole else var_holes
+            if pattern.name in holes:
+                body.append(f'if {expr} is not {holes[pattern.name]}: return None')
+            else:
+                if tp is ModelRefHole:
+                    body.append(f'if type({expr}) is not ModelRef: return None')
+                holes[pattern.name] = f'{"prop" if tp is PropHole else "var"}_{len(holes)}'
+                body.append(f'{holes[pattern.name]} = {expr}')
+        elif not _has_holes(pattern):
+            const = f'const_{len(constants)}'
+            constants.append(pattern)
+            namespace[const] = pattern
+            body.append(f'if {expr} is not {const}: return None')
+        elif tp in _BINARY_TYPES:
+            body.append(f'if type({expr}) is not {tp.__name__}: return None')
+            match(pattern.p, f'{expr}.p')
+            match(pattern.q, f'{expr}.q')
+        elif tp in _QUANT_TYPES:
+            body.append(f'if type({expr}) is not {tp.__name__}: return None')
+            match(pattern.var, f'{expr}.var')
+            match(pattern.formula, f'{expr}.formula')
+        else:
+            assert False, f'Cannot compile a matcher for {pattern}!'
     
-    try:
-        return rewrite()
-    except AssertionError:
-        old_r, new_r = new_r, old_r
-        return rewrite()
-
-
-
-def alpha_renaming(orig: Prop, new: Prop, orig_var: ModelRef, subst: Dict[ModelRef, ModelRef]={}):
-    assert type(orig) == type(new), 'Statements differ in more than just variable names!'
-    if (isinstance(orig, And) and isinstance(new, And)) or (isinstance(orig, Or) and isinstance(new, Or)) or (isinstance(orig, Imp) and isinstance(new, Imp)):
-        alpha_renaming(orig.p, new.p, orig_var, subst)
-        alpha_renaming(orig.q, new.q, orig_var, subst)
-    elif (isinstance(orig, ForAll) and isinstance(new, ForAll)) or (isinstance(orig, Exists) and isinstance(new, Exists)):
-        assert orig.var == new.var, 'Statements differ in more than just variable names!'
-        if orig_var in subst:
-            assert subst[orig_var] != new.var, 'Cannot instantiate into a quantified variable!'
-        alpha_renaming(orig.formula, new.formula, orig_var, subst)
-    elif isinstance(orig, Predicate) and isinstance(new, Predicate):
-        assert orig.name == new.name, 'Statements differ in more than just variable names!'
-        assert len(orig.args) == len(new.args), 'Statements differ in more than just variable names!'
-        for orig_arg, new_arg in zip(orig.args, new.args):
-            if orig_arg == orig_var:
-                if orig_var not in subst: subst[orig_var] = new_arg
-                assert subst[orig_var] == new_arg, f'Ambiguous substitution: [{orig_var} -> {subst[orig_var]}, {new_arg}]'
+    match(old_r, 'old')
+    match(new_r, 'new')
+    prop_bindings = ', '.join(f'{name!r}: {local}' for name, local in prop_holes.items())
+    var_bindings = ', '.join(f'{name!r}: {local}' for name, local in var_holes.items())
+    body.append(f'return {{{prop_bindings}}}, {{{var_bindings}}}')
+    
+    source = 'def matcher(old, new):\n' + ''.join(f'    {line}\n' for line in body)
+    exec(compile(source, f'<rule {old_r} => {new_r}>', 'exec'), namespace)
+    return namespace['matcher']  # type: ignore
+
+
+def alpha_renaming(orig: Prop, new: Prop, orig_var: ModelRef, subst: Dict[ModelRef, ModelRef] | None = None):
+    if subst is None:
+        subst = {}
+    # walk both trees with an explicit stack, pushing right children first so
+    # subterms are visited in the same (left-to-right) order as a recursive walk
+    stack = [(orig, new)]
+    while stack:
+        orig, new = stack.pop()
+        assert type(orig) == type(new), 'Statements differ in more than just variable names!'
+        if type(orig) in _BINARY_TYPES:
+            stack.append((orig.q, new.q))
+            stack.append((orig.p, new.p))
+        elif type(orig) in _QUANT_TYPES:
+            assert orig.var == new.var, 'Statements differ in more than just variable names!'
+            if orig_var in subst:
+                assert subst[orig_var] != new.var, 'Cannot instantiate into a quantified variable!'
+            stack.append((orig.formula, new.formula))
+        elif type(orig) is Predicate:
+            assert orig.name == new.name, 'Statements differ in more than just variable names!'
+            assert len(orig.args) == len(new.args), 'Statements differ in more than just variable names!'
+            for orig_arg, new_arg in zip(orig.args, new.args):
+                if orig_arg == orig_var:
+                    if orig_var not in subst: subst[orig_var] = new_arg
+                    assert subst[orig_var] == new_arg, f'Ambiguous substitution: [{orig_var} -> {subst[orig_var]}, {new_arg}]'
 
     
 def formula_uses(formula: Prop, var_name: ModelRef):
-    if isinstance(formula, And) or isinstance(formula, Or) or isinstance(formula, Imp):
-        return formula_uses(formula.p, var_name) or formula_uses(formula.q, var_name)
-    elif isinstance(formula, ForAll) or isinstance(formula, Exists):
-        return formula.var == var_name or formula_uses(formula.formula, var_name)
-    elif isinstance(formula, Predicate):
-        return var_name in formula.args
-    return False
+    return var_name in get_symbols(formula)[0]
 
 
-def get_symbols(formula: Prop) -> tuple[Set[ModelRef], Set[ModelRef]]:
-    if isinstance(formula, And) or isinstance(formula, Or) or isinstance(formula, Imp):
-        lsym, lvar = get_symbols(formula.p)
-        rsym, rvar = get_symbols(formula.q)
-        return lsym | rsym, lvar | rvar
-    elif isinstance(formula, ForAll) or isinstance(formula, Exists):
-        assert isinstance(formula.var, ModelRef)
-        sym, var = get_symbols(formula.formula)
-        return sym | {formula.var}, var | {formula.var}
-    elif isinstance(formula, Predicate):
-        return set(formula.args), set()
-    return set(), set()
+def get_symbols(formula: Prop) -> tuple[FrozenSet[ModelRef], FrozenSet[ModelRef]]:
+    # collected once per node when it's interned, so this never walks the formula
+    return symbols_of(formula)
 
 
 class Argument:
+    # no instance dict here, so subclasses that declare __slots__ really go without one
+    __slots__ = ()
+    
     def verify(self, line: Line, constants: Set[ModelRef]):
         return self.typecheck(line.typ)
     
@@ -171,19 +198,28 @@ class Argument:
         raise NotImplemented
     
     
-def make_argument(rule: tuple[Prop, Prop], name: str) -> Callable[[Line], Argument]:
-    class RW(Argument):
-        def __init__(self, old: Line) -> None:
-            self.old = old
-            
-        def typecheck(self, new: Prop) -> bool:
-            try_rewrite((self.old.typ, new), rule)
-            return True
+class RewriteArgument(Argument):
+    __slots__ = ('old', 'rule', 'name')
+    
+    def __init__(self, old: Line, rule: tuple[Prop, Prop], name: str) -> None:
+        self.old = old
+        self.rule = rule
+        self.name = name
         
-        def __repr__(self) -> str:
-            return f'{name} {self.old.num}'
-            
-    return RW
+    def typecheck(self, new: Prop) -> bool:
+        try_rewrite((self.old.typ, new), self.rule)
+        return True
+    
+    def __repr__(self) -> str:
+        return f'{self.name} {self.old.num}'
+
+
+# rules are tuples of interned props, so the same rule and name always give back the same constructor
+@lru_cache(maxsize=None)
+def make_argument(rule: tuple[Prop, Prop], name: str) -> Callable[[Line], Argument]:
+    # compile and index the rule's matchers now (i.e. at import) rather than on its first use
+    _rule_index(rule)
+    return lambda old: RewriteArgument(old, rule, name)
 
 a, b, c = PropHole('a'), PropHole('b'), PropHole('c')
 